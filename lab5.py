@@ -1,245 +1,441 @@
 ﻿import csv
 import sys
+from array import array
+
+# Shared, explicitly interned epsilon symbol: every transition row and
+# comparison uses the same string object, so equality checks short-circuit
+# on identity.
+EPSILON = sys.intern('ε')
 
 
 class AutomatonExporter:
     @staticmethod
     def save_to_csv(automaton_data, output_path, initial_state):
-        input_symbols = AutomatonExporter._collect_input_symbols(automaton_data)
-
-        states_order = [initial_state] + [s for s in automaton_data if s != initial_state]
+        states_order = [initial_state] + [
+            s for s in range(len(automaton_data)) if s != initial_state
+        ]
+
+        # One sweep over the sparse transitions computes both the symbol
+        # alphabet and the finished cell string for every (state, symbol)
+        # pair, so nothing downstream rescans or re-joins transitions.
+        input_symbols = set()
+        cell_strings = []
+        for state in states_order:
+            state_data = automaton_data[state]
+            grouped = {}
+            for sym, target in zip(state_data['syms'], state_data['targets']):
+                grouped.setdefault(sym, []).append(target)
+            # Targets are sorted here, once per cell while still integer
+            # ids, so every multi-target cell is emitted in ascending
+            # state order regardless of construction order.
+            cell_strings.append(
+                {
+                    sym: ','.join(f"s{t}" for t in sorted(targets))
+                    for sym, targets in grouped.items()
+                }
+            )
+            input_symbols.update(grouped)
+
+        row_map = {symbol: [''] * len(states_order) for symbol in input_symbols}
+        for index, cells in enumerate(cell_strings):
+            for sym, joined in cells.items():
+                row_map[sym][index] = joined
+
+        # Output row, header row, then one transition row per symbol,
+        # handed to the csv module in a single writerows call. Symbol cells
+        # can hold any literal character, including ';' and '"', so the
+        # csv writer's quoting is load-bearing here.
+        rows = [
+            [''] + [automaton_data[s]['output'] for s in states_order],
+            [''] + [f"s{s}" for s in states_order],
+        ]
+        rows.extend([symbol] + row_map[symbol] for symbol in sorted(input_symbols))
 
         with open(output_path, mode='w', newline='', encoding='utf-8') as file:
-            csv_writer = csv.writer(file, delimiter=';')
-
-            # Write output row
-            outputs = [''] + [automaton_data[s]['output'] for s in states_order]
-            csv_writer.writerow(outputs)
-
-            # Write header row
-            headers = [''] + states_order
-            csv_writer.writerow(headers)
-
-            # Write transition rows
-            for symbol in sorted(input_symbols):
-                row = [symbol]
-                for state in states_order:
-                    transitions = [
-                        t['nextPos']
-                        for t in automaton_data[state]['transitions']
-                        if t['inputSym'] == symbol
-                    ]
-                    row.append(','.join(transitions) if transitions else '')
-                csv_writer.writerow(row)
+            csv.writer(file, delimiter=';').writerows(rows)
 
         print(f"Automaton data saved to {output_path}")
 
     @staticmethod
-    def _collect_input_symbols(automaton_data):
-        symbols = set()
-        for state in automaton_data.values():
-            for transition in state['transitions']:
-                symbols.add(transition['inputSym'])
-        return symbols
+    def compute_epsilon_closures(automaton_data):
+        """Precompute the epsilon closure of every state in one pass.
+
+        Returns a list indexed by state id where each entry is the list of
+        state ids reachable through epsilon transitions alone (including
+        the state itself). Downstream subset construction can union these
+        precomputed lists instead of re-walking epsilon chains per state.
+        """
+        eps_targets = [
+            [
+                target
+                for sym, target in zip(state['syms'], state['targets'])
+                if sym is EPSILON
+            ]
+            for state in automaton_data
+        ]
+
+        closures = []
+        for start in range(len(automaton_data)):
+            visited = bytearray(len(automaton_data))
+            closure = []
+            stack = [start]
+            while stack:
+                current = stack.pop()
+                if visited[current]:
+                    continue
+                visited[current] = 1
+                closure.append(current)
+                # One C-level extend per node instead of a Python append
+                # (and visited test) per edge; revisits are filtered on pop.
+                stack.extend(eps_targets[current])
+            closures.append(closure)
+        return closures
+
+    @staticmethod
+    def compute_epsilon_closure_bits(automaton_data):
+        """Epsilon closures packed into integer bitmaps, one per state.
+
+        Entry i has bit j set iff state j is in the epsilon closure of
+        state i. Python ints are arbitrary-width, so a simulation step can
+        union entire state sets with a single '|' on these bitmaps instead
+        of merging hash-based sets element by element.
+        """
+        closure_bits = []
+        for closure in AutomatonExporter.compute_epsilon_closures(automaton_data):
+            bits = 0
+            for state_id in closure:
+                bits |= 1 << state_id
+            closure_bits.append(bits)
+        return closure_bits
+
+
+class Literal:
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+
+class Concat:
+    __slots__ = ('first', 'second')
+
+    def __init__(self, first, second):
+        self.first = first
+        self.second = second
+
+
+class Or:
+    __slots__ = ('first', 'second')
+
+    def __init__(self, first, second):
+        self.first = first
+        self.second = second
+
+
+class Star:
+    __slots__ = ('child',)
+
+    def __init__(self, child):
+        self.child = child
+
+
+class Plus:
+    __slots__ = ('child',)
+
+    def __init__(self, child):
+        self.child = child
 
 
 class RegexParser:
+    # Operator tags double as shunting precedences; the '(' sentinel sorts
+    # below both operators so it stops the pop loop.
+    _LPAREN = 0
+    _OR = 1
+    _CONCAT = 2
+
     def __init__(self):
-        self.state_id = 1
+        # Hash-consing table: one canonical node per distinct subtree, so
+        # repeated subexpressions like (ab|cd)(ab|cd) share structure and
+        # keys built from child ids compare structural equality in O(1).
+        self._interned = {}
+
+    def _intern_node(self, key, node_class, *args):
+        node = self._interned.get(key)
+        if node is None:
+            node = node_class(*args)
+            self._interned[key] = node
+        return node
 
     def process_pattern(self, pattern):
-        return self._parse_alternatives(pattern)
-
-    def _parse_alternatives(self, expression):
-        components = []
-        current = []
-        nesting_level = 0
+        """Build the syntax tree with one table-driven shunting-yard scan.
+
+        Implicit concatenation is inserted between adjacent operands, the
+        postfix '*'/'+' bind immediately to the finished operand on top of
+        the stack, and '|' and concatenation are reduced left-to-right by
+        precedence, so the whole pattern parses in a single loop with no
+        recursion.
+        """
+        operands = []
+        operators = []
+
+        def apply_operator(operator):
+            second = operands.pop()
+            first = operands.pop()
+            node_class = Or if operator == self._OR else Concat
+            operands.append(
+                self._intern_node(
+                    (node_class, id(first), id(second)), node_class, first, second
+                )
+            )
 
-        for char in expression:
+        previous_ends_operand = False
+        for position, char in enumerate(pattern):
             if char == "(":
-                nesting_level += 1
+                if previous_ends_operand:
+                    while operators and operators[-1] >= self._CONCAT:
+                        apply_operator(operators.pop())
+                    operators.append(self._CONCAT)
+                operators.append(self._LPAREN)
+                previous_ends_operand = False
             elif char == ")":
-                nesting_level -= 1
-            elif char == "|" and nesting_level == 0:
-                components.append("".join(current))
-                current = []
-                continue
-            current.append(char)
-
-        components.append("".join(current))
-
-        if len(components) > 1:
-            return {
-                "type": "OR",
-                "first": self._parse_sequence(components[0]),
-                "second": self._parse_alternatives("|".join(components[1:]))
-            }
-        return self._parse_sequence(expression)
-
-    def _parse_sequence(self, expression):
-        elements = []
-        position = 0
-
-        while position < len(expression):
-            if expression[position] == "(":
-                end_pos = self._find_matching_parenthesis(expression, position)
-                sub_expr = expression[position + 1:end_pos]
-                elements.append(
-                    self._parse_alternatives(sub_expr) if sub_expr else
-                    {"type": "LITERAL", "value": "ε"}
-                )
-                position = end_pos + 1
-            elif expression[position] in "*+":
-                if not elements:
+                if not previous_ends_operand and position and pattern[position - 1] == "(":
+                    operands.append(
+                        self._intern_node((Literal, EPSILON), Literal, EPSILON)
+                    )
+                while operators and operators[-1] != self._LPAREN:
+                    apply_operator(operators.pop())
+                if not operators:
+                    raise ValueError("Parentheses mismatch")
+                operators.pop()
+                previous_ends_operand = True
+            elif char == "|":
+                while operators and operators[-1] >= self._OR:
+                    apply_operator(operators.pop())
+                operators.append(self._OR)
+                previous_ends_operand = False
+            elif char in "*+":
+                if not previous_ends_operand:
                     raise ValueError(f"Invalid operator at position {position}")
-                op_type = "STAR" if expression[position] == "*" else "PLUS"
-                elements[-1] = {"type": op_type, "child": elements[-1]}
-                position += 1
+                node_class = Star if char == "*" else Plus
+                operands[-1] = self._intern_node(
+                    (node_class, id(operands[-1])), node_class, operands[-1]
+                )
             else:
-                elements.append({"type": "LITERAL", "value": expression[position]})
-                position += 1
-
-        return self._build_sequence_tree(elements) if len(elements) > 1 else elements[0]
-
-    def _build_sequence_tree(self, elements):
-        if len(elements) == 1:
-            return elements[0]
-        return {
-            "type": "CONCAT",
-            "first": elements[0],
-            "second": self._build_sequence_tree(elements[1:])
-        }
-
-    def _find_matching_parenthesis(self, expr, start):
-        depth = 1
-        for i in range(start + 1, len(expr)):
-            if expr[i] == "(":
-                depth += 1
-            elif expr[i] == ")":
-                depth -= 1
-                if depth == 0:
-                    return i
-        raise ValueError("Parentheses mismatch")
+                if previous_ends_operand:
+                    while operators and operators[-1] >= self._CONCAT:
+                        apply_operator(operators.pop())
+                    operators.append(self._CONCAT)
+                # The value is interned so symbol comparisons against
+                # EPSILON (and any repeated literal) stay identity-fast
+                # downstream.
+                value = sys.intern(char)
+                operands.append(self._intern_node((Literal, value), Literal, value))
+                previous_ends_operand = True
+
+        while operators:
+            operator = operators.pop()
+            if operator == self._LPAREN:
+                raise ValueError("Parentheses mismatch")
+            apply_operator(operator)
+
+        return operands.pop()
 
 
 class NFABuilder:
     def __init__(self):
-        self.state_counter = 1
-        self.automaton = {}
+        self.automaton = []
 
     def create_state(self):
-        state_id = f"s{self.state_counter}"
-        self.state_counter += 1
-        return {
-            "state": state_id,
+        state_id = len(self.automaton)
+        self.automaton.append({
             "output": '',
-            "transitions": []
-        }
+            "syms": [],
+            "targets": []
+        })
+        return state_id
 
     def add_epsilon_transition(self, from_state, to_state):
-        self.automaton[from_state]['transitions'].append({
-            'inputSym': 'ε',
-            'nextPos': to_state
-        })
+        state = self.automaton[from_state]
+        state['syms'].append(EPSILON)
+        state['targets'].append(to_state)
 
     def construct_from_regex(self, regex_tree):
         start_state = self.create_state()
         final_state = self.create_state()
 
-        self.automaton[start_state['state']] = start_state
-        self.automaton[final_state['state']] = final_state
-
-        nfa_data = self._build_nfa(regex_tree, start_state['state'], final_state['state'])
-
-        return nfa_data, start_state['state'], final_state['state']
+        self._build_nfa(regex_tree, start_state, final_state)
+
+        self._collapse_epsilon_chains(start_state, final_state)
+
+        return self.automaton, start_state, final_state
+
+    def to_arrays(self):
+        """Flatten the automaton into CSR-style int arrays.
+
+        Returns (eps_indptr, eps_indices, char_edges): the epsilon graph in
+        compressed sparse row form, and char_edges mapping each non-epsilon
+        symbol to its own (indptr, indices) pair. All four are array('i'),
+        i.e. contiguous machine ints that a DFA-conversion or simulation
+        backend can iterate without touching the per-state dicts.
+        """
+        eps_indptr = array('i', [0])
+        eps_indices = array('i')
+        per_symbol = {}
+        for state_id, state in enumerate(self.automaton):
+            for sym, target in zip(state['syms'], state['targets']):
+                if sym is EPSILON:
+                    eps_indices.append(target)
+                else:
+                    per_symbol.setdefault(sym, []).append((state_id, target))
+            eps_indptr.append(len(eps_indices))
+
+        char_edges = {}
+        for sym, pairs in per_symbol.items():
+            # Edges were appended in increasing state order, so counting
+            # and prefix-summing yields a valid CSR layout directly.
+            indptr = array('i', [0]) * (len(self.automaton) + 1)
+            for from_state, _ in pairs:
+                indptr[from_state + 1] += 1
+            for i in range(1, len(indptr)):
+                indptr[i] += indptr[i - 1]
+            char_edges[sym] = (indptr, array('i', (t for _, t in pairs)))
+        return eps_indptr, eps_indices, char_edges
+
+    def _collapse_epsilon_chains(self, start_id, final_id):
+        """Splice out states whose only outgoing edge is a single epsilon.
+
+        Thompson's construction leaves many degree-1 epsilon pass-through
+        states; redirecting their predecessors straight to the epsilon
+        target preserves the accepted language and shrinks the automaton.
+        The start and final states are always kept.
+        """
+        redirect = {}
+        for state_id, state in enumerate(self.automaton):
+            if state_id == start_id or state_id == final_id:
+                continue
+            if len(state['syms']) == 1 and state['syms'][0] is EPSILON:
+                redirect[state_id] = state['targets'][0]
+
+        targets = {}
+        for state_id in redirect:
+            # Follow the chain of splice-eligible states to its end; a
+            # revisit means an epsilon cycle, which is left untouched.
+            seen = set()
+            current = state_id
+            while current in redirect:
+                if current in seen:
+                    current = None
+                    break
+                seen.add(current)
+                current = redirect[current]
+            if current is not None:
+                targets[state_id] = current
+
+        if not targets:
+            return
+
+        # Flat id-indexed arrays: resolved[s] is where edges into s should
+        # now point (s itself when it is kept), remap[s] its new id after
+        # compaction, so the rewrite loop below never hashes a key.
+        resolved = list(range(len(self.automaton)))
+        for state_id, target in targets.items():
+            resolved[state_id] = target
+
+        # Compact the state list, renumbering the survivors; the start and
+        # final states are created first and always keep ids 0 and 1.
+        remap = [-1] * len(self.automaton)
+        kept = []
+        for state_id, state in enumerate(self.automaton):
+            if resolved[state_id] == state_id:
+                remap[state_id] = len(kept)
+                kept.append(state)
+
+        for state in kept:
+            # Distinct epsilon targets can resolve to the same survivor, so
+            # drop (symbol, target) duplicates while rewriting.
+            seen = set()
+            syms = []
+            targets = []
+            for sym, target in zip(state['syms'], state['targets']):
+                edge = (sym, remap[resolved[target]])
+                if edge not in seen:
+                    seen.add(edge)
+                    syms.append(sym)
+                    targets.append(edge[1])
+            state['syms'] = syms
+            state['targets'] = targets
+        self.automaton = kept
 
     def _build_nfa(self, node, entry_point, exit_point):
-        if node['type'] == 'LITERAL':
-            temp_start = self.create_state()
-            temp_end = self.create_state()
-
-            self.automaton[temp_start['state']] = temp_start
-            self.automaton[temp_end['state']] = temp_end
-
-            temp_start['transitions'].append({
-                'inputSym': node['value'],
-                'nextPos': temp_end['state']
-            })
-
-            self.add_epsilon_transition(entry_point, temp_start['state'])
-            self.add_epsilon_transition(temp_end['state'], exit_point)
-
-            return self.automaton
-
-        elif node['type'] == 'CONCAT':
-            middle_state = self.create_state()
-            self.automaton[middle_state['state']] = middle_state
-
-            self._build_nfa(node['first'], entry_point, middle_state['state'])
-            self._build_nfa(node['second'], middle_state['state'], exit_point)
-
-            return self.automaton
+        builders = self._BUILDERS
+        work = [(node, entry_point, exit_point)]
+        while work:
+            current, entry, exit = work.pop()
+            builders[type(current)](self, current, entry, exit, work)
+        return self.automaton
 
-        elif node['type'] == 'OR':
-            left_entry = self.create_state()
-            left_exit = self.create_state()
-            right_entry = self.create_state()
-            right_exit = self.create_state()
+    def _build_literal(self, node, entry_point, exit_point, work):
+        temp_start = self.create_state()
+        temp_end = self.create_state()
 
-            self.automaton.update({
-                left_entry['state']: left_entry,
-                left_exit['state']: left_exit,
-                right_entry['state']: right_entry,
-                right_exit['state']: right_exit
-            })
+        state = self.automaton[temp_start]
+        state['syms'].append(node.value)
+        state['targets'].append(temp_end)
 
-            self.add_epsilon_transition(entry_point, left_entry['state'])
-            self.add_epsilon_transition(entry_point, right_entry['state'])
+        self.add_epsilon_transition(entry_point, temp_start)
+        self.add_epsilon_transition(temp_end, exit_point)
 
-            self._build_nfa(node['first'], left_entry['state'], left_exit['state'])
-            self._build_nfa(node['second'], right_entry['state'], right_exit['state'])
+    def _build_concat(self, node, entry_point, exit_point, work):
+        middle_state = self.create_state()
 
-            self.add_epsilon_transition(left_exit['state'], exit_point)
-            self.add_epsilon_transition(right_exit['state'], exit_point)
+        work.append((node.first, entry_point, middle_state))
+        work.append((node.second, middle_state, exit_point))
 
-            return self.automaton
+    def _build_alternation(self, node, entry_point, exit_point, work):
+        left_entry = self.create_state()
+        left_exit = self.create_state()
+        right_entry = self.create_state()
+        right_exit = self.create_state()
 
-        elif node['type'] == 'STAR':
-            loop_entry = self.create_state()
-            loop_exit = self.create_state()
+        self.add_epsilon_transition(entry_point, left_entry)
+        self.add_epsilon_transition(entry_point, right_entry)
 
-            self.automaton.update({
-                loop_entry['state']: loop_entry,
-                loop_exit['state']: loop_exit
-            })
+        work.append((node.first, left_entry, left_exit))
+        work.append((node.second, right_entry, right_exit))
 
-            self.add_epsilon_transition(entry_point, loop_entry['state'])
-            self.add_epsilon_transition(entry_point, exit_point)
+        self.add_epsilon_transition(left_exit, exit_point)
+        self.add_epsilon_transition(right_exit, exit_point)
 
-            self._build_nfa(node['child'], loop_entry['state'], loop_exit['state'])
+    def _build_star(self, node, entry_point, exit_point, work):
+        loop_entry = self.create_state()
+        loop_exit = self.create_state()
 
-            self.add_epsilon_transition(loop_exit['state'], loop_entry['state'])
-            self.add_epsilon_transition(loop_exit['state'], exit_point)
+        self.add_epsilon_transition(entry_point, loop_entry)
+        self.add_epsilon_transition(entry_point, exit_point)
 
-            return self.automaton
+        work.append((node.child, loop_entry, loop_exit))
 
-        elif node['type'] == 'PLUS':
-            loop_entry = self.create_state()
-            loop_exit = self.create_state()
+        self.add_epsilon_transition(loop_exit, loop_entry)
+        self.add_epsilon_transition(loop_exit, exit_point)
 
-            self.automaton.update({
-                loop_entry['state']: loop_entry,
-                loop_exit['state']: loop_exit
-            })
+    def _build_plus(self, node, entry_point, exit_point, work):
+        loop_entry = self.create_state()
+        loop_exit = self.create_state()
 
-            self.add_epsilon_transition(entry_point, loop_entry['state'])
+        self.add_epsilon_transition(entry_point, loop_entry)
 
-            self._build_nfa(node['child'], loop_entry['state'], loop_exit['state'])
+        work.append((node.child, loop_entry, loop_exit))
 
-            self.add_epsilon_transition(loop_exit['state'], loop_entry['state'])
-            self.add_epsilon_transition(loop_exit['state'], exit_point)
+        self.add_epsilon_transition(loop_exit, loop_entry)
+        self.add_epsilon_transition(loop_exit, exit_point)
 
-            return self.automaton
+    _BUILDERS = {
+        Literal: _build_literal,
+        Concat: _build_concat,
+        Or: _build_alternation,
+        Star: _build_star,
+        Plus: _build_plus
+    }
 
 
 def execute():